@@ -1,9 +1,12 @@
 import logging
 import re
 import typing
-import weakref
-import datetime
+import functools
+import time
 import abc
+import collections
+import contextlib
+import itertools
 from collections.abc import MutableSequence, MutableMapping
 from tango.databaseds import db_errors
 import tango
@@ -13,31 +16,81 @@ _logger = logging.getLogger(__name__)
 
 th_exc = tango.Except.throw_exception
 
-if _logger.isEnabledFor(logging.DEBUG):
-
-    def _debug(funct):
-        def f(self, *args, **kwargs):
-            _logger.debug("%s: %s %s", funct.__name__, args, kwargs)
-            try:
-                returnVal = funct(self, *args, **kwargs)
-            except Exception:
-                _logger.critical("Exception during %s", funct.__name__, exc_info=True)
-                raise
-            if returnVal is not None:
-                _logger.debug("return %s -> %s", funct.__name__, returnVal)
-            else:
-                _logger.debug("return %s", funct.__name__)
-            return returnVal
+_is_enabled_for = _logger.isEnabledFor
+
+
+def _debug(funct):
+    """Trace the calls when the debug level is enabled, even at runtime"""
+
+    @functools.wraps(funct)
+    def f(self, *args, **kwargs):
+        if not _is_enabled_for(logging.DEBUG):
+            return funct(self, *args, **kwargs)
+        _logger.debug("%s: %s %s", funct.__name__, args, kwargs)
+        try:
+            returnVal = funct(self, *args, **kwargs)
+        except Exception:
+            _logger.critical("Exception during %s", funct.__name__, exc_info=True)
+            raise
+        if returnVal is not None:
+            _logger.debug("return %s -> %s", funct.__name__, returnVal)
+        else:
+            _logger.debug("return %s", funct.__name__)
+        return returnVal
+
+    return f
+
+
+# Patterns which match anything
+_MATCH_ALL = frozenset(["*", "*.*"])
+
+# Characters which make a pattern more than a plain name
+_SPECIAL_CHARS = frozenset("*.^$+?{}[]\\|()")
+
 
-        return f
+class _WildMatcher:
+    """
+    Case insensitive matcher for a pattern which can contain wildcare `*`.
+
+    The usual `name`, `prefix*`, `*suffix` and `*middle*` patterns are
+    handled with plain string operations, anything else with a regex.
+    """
 
-else:
+    __slots__ = ("fullmatch",)
 
-    def _debug(funct):
-        return funct
+    def __init__(self, pattern: str):
+        literal = pattern.strip("*")
+        if not _SPECIAL_CHARS.isdisjoint(literal):
+            regex = re.compile(pattern.replace("*", ".*"), re.IGNORECASE)
+            self.fullmatch = regex.fullmatch
+            return
+
+        literal = literal.lower()
+        head = pattern.startswith("*")
+        tail = pattern.endswith("*")
+        if head and tail:
+            self.fullmatch = lambda s: literal in s.lower()
+        elif head:
+            self.fullmatch = lambda s: s.lower().endswith(literal)
+        elif tail:
+            self.fullmatch = lambda s: s.lower().startswith(literal)
+        else:
+            self.fullmatch = lambda s: s.lower() == literal
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile_wildcard(pattern: str) -> _WildMatcher:
+    """
+    Compile a pattern which can contain wildcare `*` into a case insensitive
+    matcher.
+
+    The result is cached, as the same few patterns are requested again and
+    again by the clients.
+    """
+    return _WildMatcher(pattern)
 
 
-def list_filter(pattern: str, l: typing.List[str]) -> typing.List[str]:
+def list_filter(pattern: str, l: typing.Iterable[str]) -> typing.List[str]:
     """
     Filter a list of string with a pattern which can contain wildcare `*`.
 
@@ -45,50 +98,134 @@ def list_filter(pattern: str, l: typing.List[str]) -> typing.List[str]:
 
     Arguments:
         pattern: A string pattern with wildcare `*`. This character is supposed
-                 to be the only special character.
-        l: A list of string identifiers without special characters
+                 to be the only special character. `None` matches anything.
+        l: An iterable of string identifiers without special characters
 
     Returns:
         A list of string matching the pattern.
     """
-    pattern = pattern.replace("*", ".*")
-    m = re.compile(pattern, re.IGNORECASE)
-    return [x for x in l if x is not None and m.fullmatch(x)]
+    if pattern is None or pattern in _MATCH_ALL:
+        return [x for x in l if x is not None]
+    match = _compile_wildcard(pattern).fullmatch
+    return [x for x in l if x is not None and match(x)]
 
 
-class CaseInsensitiveDict(weakref.WeakValueDictionary):
-    @staticmethod
-    def _k(key):
-        return key.lower() if isinstance(key, str) else key
+def iter_filter(pattern: str, names: typing.Iterable[str]) -> typing.Iterator[str]:
+    """
+    Lazy version of `list_filter`, yielding the matching strings.
+    """
+    if pattern is None or pattern in _MATCH_ALL:
+        return (x for x in names if x is not None)
+    match = _compile_wildcard(pattern).fullmatch
+    return (x for x in names if x is not None and match(x))
+
+
+def items_filter(
+    pattern: str, items: typing.Iterable[typing.Tuple[str, typing.Any]]
+) -> typing.List[typing.Tuple[str, typing.Any]]:
+    """
+    Filter `(key, value)` pairs with a pattern applied on the keys.
+
+    Same rules as `list_filter`.
+    """
+    if pattern is None or pattern in _MATCH_ALL:
+        return list(items)
+    match = _compile_wildcard(pattern).fullmatch
+    return [i for i in items if match(i[0])]
+
+
+def _read_properties2(it, nb_properties):
+    """
+    Consume `nb_properties` properties from an iterator over a Tango
+    property array, each encoded as `name, nb_values, *values`.
+
+    A single value is stored as is, several values as a list.
+    """
+    properties = {}
+    for _ in range(nb_properties):
+        prop_name, nb_values = next(it), int(next(it))
+        prop_values = list(itertools.islice(it, nb_values))
+        if len(prop_values) == 1:
+            prop_values = prop_values[0]
+        properties[prop_name] = prop_values
+    return properties
+
+
+@functools.lru_cache(maxsize=1)
+def _format_time(seconds: int) -> str:
+    """
+    Format a timestamp in seconds as local time.
+
+    Devices are usually exported in bursts, so the last result is cached.
+    """
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(seconds))
+
+
+class CaseInsensitiveDict(dict):
+    """
+    Dictionary indexed by case insensitive string keys.
+
+    Keys which are not strings, like an alias loaded from YAML as an int,
+    are stored as is. The nodes are owned by the `strong_node_ref` of the
+    data source, the dictionary is only an index.
+    """
+
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs):
-        weakref.WeakValueDictionary.__init__(self)
+        dict.__init__(self)
         self.update(*args, **kwargs)
 
     def __getitem__(self, key):
-        return weakref.WeakValueDictionary.__getitem__(self, self._k(key))
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.__getitem__(self, key)
 
     def __setitem__(self, key, value):
-        weakref.WeakValueDictionary.__setitem__(self, self._k(key), value)
+        if isinstance(key, str):
+            key = key.lower()
+        dict.__setitem__(self, key, value)
 
     def __delitem__(self, key):
-        return weakref.WeakValueDictionary.__delitem__(self, self._k(key))
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.__delitem__(self, key)
 
     def __contains__(self, key):
-        return weakref.WeakValueDictionary.__contains__(self, self._k(key))
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.__contains__(self, key)
 
     def pop(self, key, *args, **kwargs):
-        return weakref.WeakValueDictionary.pop(self, self._k(key), *args, **kwargs)
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.pop(self, key, *args, **kwargs)
 
     def get(self, key, *args, **kwargs):
-        return weakref.WeakValueDictionary.get(self, self._k(key), *args, **kwargs)
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.get(self, key, *args, **kwargs)
+
+    def get_lowered(self, key, default=None):
+        """
+        Fast `get` for a key which is already lower case.
+
+        Bypass the case normalization.
+        """
+        return dict.get(self, key, default)
 
     def setdefault(self, key, *args, **kwargs):
-        return CaseInsensitiveDict.setdefault(self, self._k(key), *args, **kwargs)
+        if isinstance(key, str):
+            key = key.lower()
+        return dict.setdefault(self, key, *args, **kwargs)
 
     def update(self, arg={}, **kwargs):
-        for key, value in dict(arg).items():
-            self[key] = value
+        items = arg.items() if hasattr(arg, "items") else arg
+        setitem = dict.__setitem__
+        for key, value in items:
+            if isinstance(key, str):
+                key = key.lower()
+            setitem(self, key, value)
         if kwargs:
             self.update(kwargs)
 
@@ -100,6 +237,24 @@ class DataSource(abc.ABC):
         self._personal_2_node = CaseInsensitiveDict()
         self._tango_name_2_node = CaseInsensitiveDict()
         self._class_name_2_node = CaseInsensitiveDict()
+        self._alias_2_node = {}
+        # Device name (lower case) -> components of the device name
+        self._tango_name_components = {}
+        # Device class name -> number of devices using it
+        self._device_classes = collections.Counter()
+        # Device class name -> names (lower case) of its devices
+        self._class_2_devices = {}
+        # Names (lower case) of the devices exported since the start, a dict
+        # used as an ordered set to reply in the order of the exports
+        self._exported_devices = {}
+        # Host name -> names of the devices exported from it
+        self._host_2_devices = {}
+        # Executable names (lower case) of the servers in personal_2_node
+        self._server_names = set()
+        # Names (lower case) of the dserver devices, "dserver/server/instance"
+        self._dserver_names = set()
+        # Attribute name -> its aliases, reverse of get_attr_alias_mapping
+        self._attr_name_2_aliases = {}
 
         self._init_db()
         self._parse_all()
@@ -114,17 +269,22 @@ class DataSource(abc.ABC):
         self._beacon_dserver_node = self.create_empty()
         self._beacon_dserver_node["server"] = "DataBaseds"
         self._beacon_dserver_node["personal_name"] = personal_name
-        tango_name = "sys/database/%s" % personal_name
+        tango_name = f"sys/database/{personal_name}"
         database_device_node = self.create_empty(self._beacon_dserver_node)
         database_device_node["class"] = "DataBase"
+        self._device_classes["DataBase"] += 1
+        self._class_2_devices.setdefault("DataBase", set()).add(tango_name.lower())
         database_device_node["tango_name"] = tango_name
         self._beacon_dserver_node["device"] = [database_device_node]
         self._beacon_dserver_node["tango_name"] = tango_name
         self._tango_name_2_node[tango_name] = database_device_node
-        tango_name_ds = "dserver/databaseds/%s" % personal_name
+        self._tango_name_components[tango_name.lower()] = tango_name.split("/")
+        tango_name_ds = f"dserver/databaseds/{personal_name}"
         self._tango_name_2_node[tango_name_ds] = self._beacon_dserver_node
-        server_name = "DataBaseds/%s" % personal_name
+        self._dserver_names.add(tango_name_ds.lower())
+        server_name = f"DataBaseds/{personal_name}"
         self._personal_2_node[server_name] = self._beacon_dserver_node
+        self._server_names.add("databaseds")
 
     def _parse_all(self):
         root = self._get_root_node()
@@ -133,17 +293,23 @@ class DataSource(abc.ABC):
     def _parse_node(self, node):
         """
         Parse a dict dispatching it into the right parser kind.
+
+        Nested sequences are walked in order with an explicit stack.
         """
-        if isinstance(node, MutableSequence):
-            for n in node:
-                self._parse_node(n)
-        elif isinstance(node, MutableMapping):
-            if "server" in node:
-                self._parse_tango_server(node)
-            elif "class" in node:
-                self._parse_tango_class(node)
-            else:
-                _logger.error("Content unsupported. Found:\n%s", dict(node))
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, MutableSequence):
+                children = [n for n in node]
+                children.reverse()
+                stack.extend(children)
+            elif isinstance(node, MutableMapping):
+                if "server" in node:
+                    self._parse_tango_server(node)
+                elif "class" in node:
+                    self._parse_tango_class(node)
+                else:
+                    _logger.error("Content unsupported. Found:\n%s", dict(node))
 
     def _parse_tango_class(self, node):
         """
@@ -172,27 +338,47 @@ class DataSource(abc.ABC):
             )
             return
 
-        dserver_name = "%s/%s" % (server, personal_name)
+        tango_name_2_node = self._tango_name_2_node
+        tango_name_components = self._tango_name_components
+        device_classes = self._device_classes
+        class_2_devices = self._class_2_devices
+        alias_2_node = self._alias_2_node
+        add_strong_ref = self._strong_node_ref.add
+        create_device = self.create_device
+
+        dserver_name = f"{server}/{personal_name}"
         self._personal_2_node[dserver_name] = node
-        self._tango_name_2_node["dserver/%s" % dserver_name.lower()] = node
-        self._strong_node_ref.add(node)
+        self._server_names.add(server.lower())
+        tango_name_ds = f"dserver/{dserver_name.lower()}"
+        tango_name_2_node[tango_name_ds] = node
+        self._dserver_names.add(tango_name_ds)
+        add_strong_ref(node)
 
         devices = node.get("device")
         for device_info in devices:
-            device_node = self.create_device(device_info, parent=node)
+            device_node = create_device(device_info, parent=node)
             if device_node is None:
                 continue
 
             tango_name = device_node.get("tango_name")
             if tango_name is not None:
+                components = tango_name.split("/")
                 tango_name = tango_name.lower()
-                self._tango_name_2_node[tango_name] = device_node
+                tango_name_2_node[tango_name] = device_node
+                tango_name_components[tango_name] = components
+
+            class_name = device_node.get("class")
+            if class_name is not None:
+                device_classes[class_name] += 1
+                if tango_name is not None:
+                    class_2_devices.setdefault(class_name, set()).add(tango_name)
 
             alias = device_node.get("alias")
             if alias is not None:
-                self._tango_name_2_node[alias] = device_node
+                tango_name_2_node[alias] = device_node
+                alias_2_node[alias] = device_node
 
-            self._strong_node_ref.add(device_node)
+            add_strong_ref(device_node)
 
     def get_class_property(self, klass_name, prop_name):
         # key_name = 'tango.class.properties.%s.%s' % (klass_name,prop_name)
@@ -203,7 +389,7 @@ class DataSource(abc.ABC):
 
     def get_property_node(self, dev_name):
         dev_name = dev_name.lower()
-        device_node = self._tango_name_2_node.get(dev_name)
+        device_node = self._tango_name_2_node.get_lowered(dev_name)
         if device_node is None:
             return None
 
@@ -247,6 +433,42 @@ class DataSource(abc.ABC):
     def class_name_2_node(self):
         return self._class_name_2_node
 
+    @property
+    def alias_2_node(self):
+        return self._alias_2_node
+
+    @property
+    def tango_name_components(self):
+        return self._tango_name_components
+
+    @property
+    def device_classes(self):
+        return self._device_classes
+
+    @property
+    def exported_devices(self):
+        return self._exported_devices
+
+    @property
+    def class_2_devices(self):
+        return self._class_2_devices
+
+    @property
+    def host_2_devices(self):
+        return self._host_2_devices
+
+    @property
+    def server_names(self):
+        return self._server_names
+
+    @property
+    def dserver_names(self):
+        return self._dserver_names
+
+    @property
+    def attr_name_2_aliases(self):
+        return self._attr_name_2_aliases
+
     @abc.abstractmethod
     def _get_root_node(self):
         ...
@@ -295,18 +517,40 @@ class DataSource(abc.ABC):
     def get_exported_devices_keys(self, key_filter):
         ...
 
+    def save_batch(self):
+        """
+        Context manager deferring the saves of the nodes until its exit.
+
+        Nothing is deferred by default.
+        """
+        return contextlib.nullcontext()
+
 
 class dbapi(abc.ABC):
 
     DB_API_NAME = "beacon"
 
+    # How long (seconds) get_device_info can reuse the exported device info
+    DEVICE_INFO_TTL = 0.1
+
     def __init__(self, personal_name="2", db_path="tango", **keys):
         self._source = self._create_data_source(personal_name, db_path)
+        # Device name -> (monotonic time, exported device info)
+        self._device_info_cache = {}
+        # Device name -> "server/instance" name, or None
+        self._device_server_cache = {}
 
     @abc.abstractmethod
     def _create_data_source(self, personal_name, db_access):
         ...
 
+    def save_batch(self):
+        """
+        Context manager deferring the saves of a bulk of calls, each modified
+        node being saved once at its exit.
+        """
+        return self._source.save_batch()
+
     # TANGO API
     @_debug
     def get_stored_procedure_release(self):
@@ -316,29 +560,35 @@ class dbapi(abc.ABC):
     def add_device(self, server_name, dev_info, klass_name, alias=None):
         tango_name, _ = dev_info
         tango_name = tango_name.lower()
-        device_node = self._source.tango_name_2_node.get(tango_name)
+        device_node = self._source.tango_name_2_node.get_lowered(tango_name)
         if device_node is not None:  # There is a problem?
             return
-        server_exe_name, personal_name = server_name.split("/")
-        personal_name = personal_name.lower()
-        server_name = "%s/%s" % (server_exe_name, personal_name)
-        server_node = self._source.personal_2_node.get(server_name)
+        server_name_lc = server_name.lower()
+        server_node = self._source.personal_2_node.get_lowered(server_name_lc)
         if server_node is None:
+            server_exe_name, personal_name = server_name.split("/")
+            personal_name = personal_name.lower()
+            server_name = f"{server_exe_name}/{personal_name}"
             server_node = self._source.create_server_filename(server_name)
             server_node["server"] = server_exe_name
             server_node["personal_name"] = personal_name
-            self._source.personal_2_node[server_name] = server_node
-            self._source.tango_name_2_node[
-                "dserver/%s" % server_name.lower()
-            ] = server_node
+            self._source.personal_2_node[server_name_lc] = server_node
+            self._source.server_names.add(server_exe_name.lower())
+            self._source.tango_name_2_node["dserver/" + server_name_lc] = server_node
+            self._source.dserver_names.add("dserver/" + server_name_lc)
             self._source.strong_node_ref.add(server_node)
 
+        self._device_server_cache.pop(tango_name, None)
         device_node = self._source.create_empty(server_node)
         self._source.strong_node_ref.add(device_node)
         device_node["tango_name"] = tango_name
         device_node["class"] = klass_name
+        self._source.tango_name_components[tango_name] = tango_name.split("/")
+        self._source.device_classes[klass_name] += 1
+        self._source.class_2_devices.setdefault(klass_name, set()).add(tango_name)
         if alias is not None:
             device_node["alias"] = alias
+            self._source.alias_2_node[alias] = device_node
         device_node_list = server_node.get("device", [])
         device_node_list.append(device_node)
         server_node["device"] = device_node_list
@@ -349,7 +599,12 @@ class dbapi(abc.ABC):
     @_debug
     def delete_attribute_alias(self, alias):
         attr_alias = self._source.get_attr_alias_mapping()
-        del attr_alias[alias]
+        attr_name = attr_alias.pop(alias)
+        aliases = self._source.attr_name_2_aliases.get(attr_name)
+        if aliases is not None:
+            aliases.remove(alias)
+            if not aliases:
+                del self._source.attr_name_2_aliases[attr_name]
 
     @_debug
     def delete_class_attribute(self, klass_name, attr_name):
@@ -371,8 +626,7 @@ class dbapi(abc.ABC):
     @_debug
     def delete_device(self, dev_name):
         dev_name = dev_name.lower()
-
-        device_node = self._source.tango_name_2_node.pop(dev_name, None)
+        device_node = self._forget_device(dev_name)
         if device_node is None:
             return
 
@@ -386,12 +640,44 @@ class dbapi(abc.ABC):
         prop_attr_device = self._source.get_property_attr_device(dev_name)
         prop_attr_device.clear()
 
+    def _forget_device(self, dev_name):
+        """
+        Remove a device (lower case name) from the indexes.
+
+        Returns its node, or None if the device is not indexed.
+        """
+        self._device_info_cache.pop(dev_name, None)
+        self._device_server_cache.pop(dev_name, None)
+        self._forget_export(dev_name)
+        device_node = self._source.tango_name_2_node.pop(dev_name, None)
+        if device_node is None:
+            return None
+        self._source.tango_name_components.pop(dev_name, None)
+        self._forget_device_class(device_node.get("class"), dev_name)
+        alias = device_node.get("alias")
+        if alias is not None:
+            self._source.alias_2_node.pop(alias, None)
+        return device_node
+
+    def _forget_export(self, dev_name):
+        """Remove a device (lower case name) from the exported indexes"""
+        exported_devices = self._source.exported_devices
+        if dev_name not in exported_devices:
+            return
+        del exported_devices[dev_name]
+        device_info = self._source.get_exported_device_info(dev_name)
+        self._forget_device_host(dev_name, device_info.get("host"))
+
     @_debug
     def delete_device_alias(self, dev_alias):
         device_node = self._source.tango_name_2_node.pop(dev_alias)
         if device_node is None:
             return
 
+        alias = device_node.get("alias")
+        if alias is not None:
+            self._source.alias_2_node.pop(alias, None)
+
         server_node = device_node.parent
         if server_node is None:  # weird
             return
@@ -436,6 +722,13 @@ class dbapi(abc.ABC):
         if server_node is None:
             return
 
+        for device_node in server_node.get("device", []):
+            tango_name = device_node.get("tango_name")
+            if tango_name is None:
+                self._forget_device_class(device_node.get("class"))
+            else:
+                self._forget_device(tango_name.lower())
+        self._device_server_cache.clear()
         server_node.clear()
         server_node.save()
 
@@ -448,7 +741,7 @@ class dbapi(abc.ABC):
     @_debug
     def export_device(self, dev_name, IOR, host, pid, version):
         dev_name = dev_name.lower()
-        device_node = self._source.tango_name_2_node.get(dev_name)
+        device_node = self._source.tango_name_2_node.get_lowered(dev_name)
         if device_node is None:
             th_exc(
                 db_errors.DB_DeviceNotDefined,
@@ -456,15 +749,19 @@ class dbapi(abc.ABC):
                 "DataBase::ExportDevice()",
             )
 
+        self._device_info_cache.pop(dev_name, None)
+        self._source.exported_devices[dev_name] = None
         export_device_info = self._source.get_exported_device_info(dev_name)
-        start_time = datetime.datetime.now()
+        self._forget_device_host(dev_name, export_device_info.get("host"))
+        self._source.host_2_devices.setdefault(host, set()).add(dev_name)
+        start_time = _format_time(int(time.time()))
         export_device_info.set(
             {
                 "IOR": IOR,
                 "host": host,
                 "pid": int(pid),
                 "version": version,
-                "start-time": "%s" % start_time,
+                "start-time": start_time,
             }
         )
 
@@ -524,7 +821,8 @@ class dbapi(abc.ABC):
                 class_name, att_name
             )
             attr_property = [x for p in class_attribute_properties.items() for x in p]
-            result.extend([att_name, str(len(attr_property) / 2)] + attr_property)
+            result += (att_name, str(len(attr_property) / 2))
+            result += attr_property
         return result
 
     @_debug
@@ -532,16 +830,12 @@ class dbapi(abc.ABC):
         result = [class_name, str(len(attributes))]
         for attr_name in attributes:
             class_properties = self._source.get_class_attribute(class_name, attr_name)
-            attr_property = []
+            result += (attr_name, str(len(class_properties)))
             for (name, values) in class_properties.items():
                 if isinstance(values, MutableSequence):
-                    attr_property.extend(
-                        [name, str(len(values))] + [str(x) for x in values]
-                    )
+                    result += (name, str(len(values)), *map(str, values))
                 else:
-                    attr_property.extend([name, "1", str(values)])
-            nb = len(class_properties.items())
-            result.extend([attr_name, str(nb)] + attr_property)
+                    result += (name, "1", str(values))
         return result
 
     @_debug
@@ -552,7 +846,7 @@ class dbapi(abc.ABC):
     @_debug
     def get_class_for_device(self, dev_name):
         dev_name = dev_name.lower()
-        device_node = self._source.tango_name_2_node.get(dev_name)
+        device_node = self._source.tango_name_2_node.get_lowered(dev_name)
         if device_node is None:
             th_exc(
                 db_errors.DB_IncorrectArguments,
@@ -576,9 +870,9 @@ class dbapi(abc.ABC):
 
     @_debug
     def get_class_list(self, wildcard):
-        server_names = list(self._source.personal_2_node.keys())
-        result = self._get_device_classes(server_names)
-        result = list_filter(wildcard, result)
+        class_names = set(self._source.device_classes.keys())
+        class_names.add("DServer")
+        result = list_filter(wildcard, class_names)
         result.sort()
         return result
 
@@ -586,16 +880,13 @@ class dbapi(abc.ABC):
     def get_class_property(self, class_name, properties):
         result = [class_name, str(len(properties))]
         for prop_name in properties:
-            properties_array = []
             values = self._source.get_class_property(class_name, prop_name)
             if values is None:
-                properties_array.extend([prop_name, "0"])
+                result += (prop_name, "0")
             elif isinstance(values, MutableSequence):
-                values = [str(x) for x in values]
-                properties_array.extend([prop_name, str(len(values))] + values)
+                result += (prop_name, str(len(values)), *map(str, values))
             else:
-                properties_array.extend([prop_name, "1", str(values)])
-            result.extend(properties_array)
+                result += (prop_name, "1", str(values))
         return result
 
     @_debug
@@ -613,7 +904,7 @@ class dbapi(abc.ABC):
     @_debug
     def get_device_alias(self, dev_name):
         dev_name = dev_name.lower()
-        device_node = self._source.tango_name_2_node.get(dev_name)
+        device_node = self._source.tango_name_2_node.get_lowered(dev_name)
         if device_node is None:
             th_exc(
                 db_errors.DB_DeviceNotDefined,
@@ -631,15 +922,12 @@ class dbapi(abc.ABC):
 
     @_debug
     def get_device_alias_list(self, alias):
-        alias_list = [
-            node.get("alias") for node in list(self._source.tango_name_2_node.values())
-        ]
-        return list_filter(alias, alias_list)
+        return list_filter(alias, self._source.alias_2_node.keys())
 
     @_debug
     def get_device_attribute_list(self, dev_name, attribute):
         prop_attr_device = self._source.get_property_attr_device(dev_name)
-        return list_filter(attribute, list(prop_attr_device.keys()))
+        return list_filter(attribute, prop_attr_device.keys())
 
     @_debug
     def get_device_attribute_property(self, dev_name, attributes):
@@ -648,12 +936,10 @@ class dbapi(abc.ABC):
         for attr_name in attributes:
             prop_attr = prop_attr_device.get(attr_name)
             if prop_attr is None:
-                result.extend([attr_name, "0"])
+                result += (attr_name, "0")
             else:
-                result.extend(
-                    [attr_name, str(len(prop_attr))]
-                    + [str(x) for p in prop_attr.items() for x in p]
-                )
+                result += (attr_name, str(len(prop_attr)))
+                result += (str(x) for p in prop_attr.items() for x in p)
         return result
 
     @_debug
@@ -664,16 +950,14 @@ class dbapi(abc.ABC):
         for attr_name in attributes:
             prop_attr = prop_attr_device.get(attr_name)
             if prop_attr is None:
-                result.extend((attr_name, "0"))
+                result += (attr_name, "0")
             else:
-                result.extend((attr_name, str(len(prop_attr))))
+                result += (attr_name, str(len(prop_attr)))
                 for name, values in prop_attr.items():
                     if isinstance(values, MutableSequence):
-                        result.extend(
-                            [name, str(len(values))] + [str(x) for x in values]
-                        )
+                        result += (name, str(len(values)), *map(str, values))
                     else:
-                        result.extend((name, "1", str(values)))
+                        result += (name, "1", str(values))
         return result
 
     @_debug
@@ -696,104 +980,102 @@ class dbapi(abc.ABC):
 
     @_debug
     def get_device_domain_list(self, wildcard):
-        filtered_names = list_filter(
-            wildcard,
-            [
-                n.get("tango_name")
-                for n in list(self._source.tango_name_2_node.values())
-            ],
-        )
-        res = list(set([x.split("/")[0] for x in filtered_names]))
-        res.sort()
-        return res
+        components = self._source.tango_name_components
+        filtered_names = list_filter(wildcard, components.keys())
+        return sorted({components[x][0] for x in filtered_names})
 
     @_debug
     def get_device_exported_list(self, wildcard):
-        return self._source.get_exported_devices_keys(wildcard)
+        return list_filter(wildcard, self._source.exported_devices)
 
     @_debug
     def get_device_family_list(self, wildcard):
-        filtered_names = list_filter(
-            wildcard,
-            [
-                n.get("tango_name")
-                for n in list(self._source.tango_name_2_node.values())
-            ],
-        )
-        return list(set([x.split("/")[1] for x in filtered_names]))
+        components = self._source.tango_name_components
+        filtered_names = list_filter(wildcard, components.keys())
+        return list({components[x][1] for x in filtered_names})
 
     def get_device_info(self, dev_name):
         dev_name = dev_name.lower()
-        device_info = self._source.get_exported_device_info(dev_name)
-        device_node = self._source.tango_name_2_node.get(dev_name)
-        result_long = []
-        result_str = []
-
-        info = device_info.get_all()
-        if device_node:
-            if dev_name.startswith("dserver"):
-                server_node = device_node
-            else:
-                server_node = device_node.parent
-            tango_name = (
-                server_node.get("server", "")
-                + "/"
-                + server_node.get("personal_name", "")
-            )
-            result_str.extend(
-                (
-                    dev_name,
-                    info.get("IOR", ""),
-                    str(info.get("version", "0")),
-                    tango_name,
-                    info.get("host", "?"),
-                    info.get("start-time", "?"),
-                    "?",
-                    device_node.get("class", "DServer"),
-                )
-            )
-            result_long.extend((info and 1 or 0, info.get("pid", -1)))
+        now = time.monotonic()
+        cached = self._device_info_cache.get(dev_name)
+        if cached is not None and now - cached[0] < self.DEVICE_INFO_TTL:
+            info = cached[1]
+        else:
+            info = self._source.get_exported_device_info(dev_name).get_all()
+            self._device_info_cache[dev_name] = (now, info)
+        device_node = self._source.tango_name_2_node.get_lowered(dev_name)
+        if not device_node:
+            return ([], [])
+
+        if dev_name.startswith("dserver"):
+            server_node = device_node
+        else:
+            server_node = device_node.parent
+        tango_name = "/".join(
+            (server_node.get("server", ""), server_node.get("personal_name", ""))
+        )
+        result_str = [
+            dev_name,
+            info.get("IOR", ""),
+            str(info.get("version", "0")),
+            tango_name,
+            info.get("host", "?"),
+            info.get("start-time", "?"),
+            "?",
+            device_node.get("class", "DServer"),
+        ]
+        result_long = [1 if info else 0, info.get("pid", -1)]
         return (result_long, result_str)
 
     @_debug
     def get_device_list(self, server_name, class_name):
+        m = None if class_name in _MATCH_ALL else _compile_wildcard(class_name)
         if server_name == "*":
             r_list = list()
             for server_node in list(self._source.personal_2_node.values()):
                 device_list = server_node.get("device")
-                r_list.extend(self._get_tango_name_from_class(device_list, class_name))
+                r_list.extend(self._get_tango_name_from_class(device_list, m))
             return r_list
 
         server_node = self._source.personal_2_node.get(server_name)
         if server_node is None:
             return []
         device_list = server_node.get("device")
-        return self._get_tango_name_from_class(device_list, class_name)
+        return self._get_tango_name_from_class(device_list, m)
 
-    def _get_tango_name_from_class(self, device_list, class_name):
-        m = re.compile(class_name.replace("*", ".*"), re.IGNORECASE)
+    def _get_tango_name_from_class(self, device_list, m):
+        """
+        Returns the device names which class fully matches the compiled
+        pattern `m`, or all of them if `m` is None.
+        """
         if isinstance(device_list, MutableSequence):
+            if m is None:
+                return [x.get("tango_name") for x in device_list]
             return [
-                x.get("tango_name") for x in device_list if m.match(x.get("class", ""))
+                x.get("tango_name")
+                for x in device_list
+                if m.fullmatch(x.get("class", ""))
             ]
-        elif isinstance(device_list, MutableMapping) and m.match(
-            device_list.get("class", "")
-        ):
-            return [device_list.get("tango_name")]
+        elif isinstance(device_list, MutableMapping):
+            if m is None or m.fullmatch(device_list.get("class", "")):
+                return [device_list.get("tango_name")]
+            return []
         else:
             return []
 
     @_debug
     def get_device_wide_list(self, wildcard):
-        return list_filter(wildcard, list(self._source.tango_name_2_node.keys()))
+        return list_filter(wildcard, self._source.tango_name_2_node.keys())
 
     @_debug
     def get_device_member_list(self, wildcard):
-        wildcard = wildcard.lower()
-        filtered_names = list_filter(
-            wildcard, list(self._source.tango_name_2_node.keys())
+        source = self._source
+        filtered_names = itertools.chain(
+            iter_filter(wildcard, source.tango_name_components.keys()),
+            iter_filter(wildcard, source.dserver_names),
         )
-        return list(set([x.split("/")[-1] for x in filtered_names]))
+        # The members are listed in lower case, as the names are indexed
+        return list({x.rsplit("/", 1)[-1] for x in filtered_names})
 
     @_debug
     def get_device_property(self, dev_name, properties_query_list):
@@ -802,30 +1084,28 @@ class dbapi(abc.ABC):
         if properties is None:
             result = [dev_name, str(len(properties_query_list))]
             for p_name in properties_query_list:
-                result.extend([p_name, "0", ""])
+                result += (p_name, "0", "")
             return result
         else:
             nb_properties = 0
-            properties_array = []
-            properties_key = list(properties.keys())
+            # The number of properties is only known at the end
+            result = [dev_name, None]
+            properties_items = list(properties.items())
             for property_name in properties_query_list:
-                ask_keys = list_filter(property_name, properties_key)
-                if not ask_keys:
-                    properties_array.extend([property_name, "0", ""])
+                ask_items = items_filter(property_name, properties_items)
+                if not ask_items:
+                    result += (property_name, "0", "")
                     nb_properties += 1
 
-                for key in ask_keys:
-                    values = properties.get(key, "")
+                for _key, values in ask_items:
                     if isinstance(values, MutableSequence):
-                        values = [str(x) for x in values]
-                        properties_array.extend(
-                            [property_name, str(len(values))] + values
-                        )
+                        result += (property_name, str(len(values)), *map(str, values))
                     else:
-                        properties_array.extend([property_name, "1", str(values)])
+                        result += (property_name, "1", str(values))
 
-                nb_properties += len(ask_keys)
-            return [dev_name, str(nb_properties)] + properties_array
+                nb_properties += len(ask_items)
+            result[1] = str(nb_properties)
+            return result
 
     @_debug
     def get_device_property_list(self, device_name, prop_filter):
@@ -857,52 +1137,54 @@ class dbapi(abc.ABC):
 
     @_debug
     def get_exported_device_list_for_class(self, wildcard):
-        result = []
-        exported_devices = self._source.get_exported_devices_keys("*")
-        m = re.compile(wildcard.replace("*", ".*"), re.IGNORECASE)
-        for dev_name in exported_devices:
-            dev_node = self._source.tango_name_2_node.get(dev_name)
-            if dev_node:
-                dev_class_name = dev_node.get("class", "")
-                if m.match(dev_class_name):
-                    result.append(dev_name)
-        return result
+        exported_devices = self._source.exported_devices
+        if wildcard in _MATCH_ALL:
+            # exported devices are indexed in lower case
+            get_node = self._source.tango_name_2_node.get_lowered
+            return [dev_name for dev_name in exported_devices if get_node(dev_name)]
+        # Filter the classes, usually much fewer than the devices
+        class_2_devices = self._source.class_2_devices
+        class_names = list_filter(wildcard, class_2_devices.keys())
+        devices = set().union(*(class_2_devices[name] for name in class_names))
+        return [dev_name for dev_name in exported_devices if dev_name in devices]
 
     @_debug
     def get_host_list(self, host_name):
-        source = self._source
-        host_list = {
-            source.get_exported_device_info(key_name).get("host")
-            for key_name in source.get_exported_devices_keys("*")
-        }
-        return list_filter(host_name, host_list)
+        return list_filter(host_name, self._source.host_2_devices.keys())
 
     @_debug
     def get_host_server_list(self, host_name):
-        source = self._source
+        host_2_devices = self._source.host_2_devices
+        cache = self._device_server_cache
+        get_device_server = self._get_device_server
         result = []
-        wildcard = host_name.replace("*", ".*")
-        m = re.compile(wildcard)
-        exported_devices = self._source.get_exported_devices_keys("*")
-        for dev_name in exported_devices:
-            host = source.get_exported_device_info(dev_name).get("host")
-            if not m.match(host):
-                continue
-            dev_node = self._source.tango_name_2_node.get(dev_name)
-            if dev_node is None:
-                continue
-            if "server" in dev_node:
-                continue
-            server_node = dev_node.parent
-            if server_node is None:
-                continue
-            server_name = server_node.get("server")
-            server_instance = server_node.get("personal_name")
-            if not server_name or not server_instance:
-                continue
-            result.append("%s/%s" % (server_name, server_instance))
+        append = result.append
+        for host in list_filter(host_name, host_2_devices.keys()):
+            for dev_name in host_2_devices[host]:
+                try:
+                    server = cache[dev_name]
+                except KeyError:
+                    server = cache[dev_name] = get_device_server(dev_name)
+                if server is not None:
+                    append(server)
         return result
 
+    def _get_device_server(self, dev_name):
+        """Returns the "server/instance" name hosting a device, if any"""
+        dev_node = self._source.tango_name_2_node.get(dev_name)
+        if dev_node is None:
+            return None
+        if "server" in dev_node:
+            return None
+        server_node = dev_node.parent
+        if server_node is None:
+            return None
+        server_name = server_node.get("server")
+        server_instance = server_node.get("personal_name")
+        if not server_name or not server_instance:
+            return None
+        return f"{server_name}/{server_instance}"
+
     @_debug
     def get_host_servers_info(self, host_name):
         # Don't know what it is?
@@ -945,40 +1227,40 @@ class dbapi(abc.ABC):
 
     @_debug
     def get_server_list(self, wildcard):
-        return list_filter(wildcard, list(self._source.personal_2_node.keys()))
+        return list_filter(wildcard, self._source.personal_2_node.keys())
 
     @_debug
     def get_server_name_list(self, wildcard):
-        res = list(
-            set(
-                list_filter(
-                    wildcard,
-                    [
-                        x.split("/")[0]
-                        for x in list(self._source.personal_2_node.keys())
-                    ],
-                )
-            )
-        )
-        res.sort()
-        return res
+        return sorted(list_filter(wildcard, self._source.server_names))
 
     @_debug
     def get_server_class_list(self, wildcard):
-        server_names = list_filter(wildcard, list(self._source.personal_2_node.keys()))
-        result = self._get_device_classes(server_names)
-        result = list(result)
-        result.sort()
-        return result
+        server_names = list_filter(wildcard, self._source.personal_2_node.keys())
+        return sorted(self._get_device_classes(server_names))
+
+    def _forget_device_class(self, class_name, tango_name=None):
+        devices = self._source.class_2_devices.get(class_name)
+        if devices is not None:
+            devices.discard(tango_name)
+            if not devices:
+                del self._source.class_2_devices[class_name]
+        device_classes = self._source.device_classes
+        if class_name not in device_classes:
+            return
+        device_classes[class_name] -= 1
+        if device_classes[class_name] <= 0:
+            del device_classes[class_name]
 
     def _get_device_classes(self, server_names):
         result = set()
+        add = result.add
+        get_server = self._source.personal_2_node.get
         for ser_name in server_names:
-            server_node = self._source.personal_2_node.get(ser_name)
+            server_node = get_server(ser_name)
             for device_node in server_node.get("device", []):
                 class_name = device_node.get("class")
                 if class_name is not None:
-                    result.add(class_name)
+                    add(class_name)
         result.add("DServer")
         return result
 
@@ -1017,55 +1299,33 @@ class dbapi(abc.ABC):
                 "DataBase::DbPutAttributeAlias()",
             )
         attr_alias[attr_alias_name] = attribute_name
+        self._source.attr_name_2_aliases.setdefault(attribute_name, []).append(
+            attr_alias_name
+        )
 
     @_debug
     def put_class_attribute_property(self, class_name, nb_attributes, attr_prop_list):
-        attr_id = 0
+        it = iter(attr_prop_list)
         for _ in range(nb_attributes):
-            attr_name, nb_properties = (
-                attr_prop_list[attr_id],
-                int(attr_prop_list[attr_id + 1]),
-            )
-            attr_id += 2
+            attr_name, nb_properties = next(it), int(next(it))
             class_properties = self._source.get_class_attribute(class_name, attr_name)
-            new_values = {}
-            for prop_id in range(attr_id, attr_id + nb_properties * 2, 2):
-                prop_name, prop_val = (
-                    attr_prop_list[prop_id],
-                    attr_prop_list[prop_id + 1],
-                )
-                new_values[prop_name] = prop_val
-            attr_id += nb_properties * 2
-            class_properties.set(new_values)
+            pairs = itertools.islice(it, nb_properties * 2)
+            class_properties.set(dict(zip(pairs, pairs)))
 
     @_debug
     def put_class_attribute_property2(self, class_name, nb_attributes, attr_prop_list):
-        attr_id = 0
+        it = iter(attr_prop_list)
         for _ in range(nb_attributes):
-            attr_name, nb_properties = (
-                attr_prop_list[attr_id],
-                int(attr_prop_list[attr_id + 1]),
-            )
-            attr_id += 2
+            attr_name, nb_properties = next(it), int(next(it))
             class_properties = self._source.get_class_attribute(class_name, attr_name)
-            new_values = {}
-            for _prop_id in range(nb_properties):
-                prop_name, prop_number = (
-                    attr_prop_list[attr_id],
-                    int(attr_prop_list[attr_id + 1]),
-                )
-                attr_id += 2
-                prop_values = []
-                for _prop_sub_id in range(prop_number):
-                    prop_values.append(attr_prop_list[attr_id])
-                    attr_id += 1
-                if len(prop_values) == 1:
-                    prop_values = prop_values[0]
-                new_values[prop_name] = prop_values
-            class_properties.set(new_values)
+            class_properties.set(_read_properties2(it, nb_properties))
 
     @_debug
     def put_class_property(self, class_name, nb_properties, attr_prop_list):
+        with self._source.save_batch():
+            self._put_class_property(class_name, nb_properties, attr_prop_list)
+
+    def _put_class_property(self, class_name, nb_properties, attr_prop_list):
         attr_id = 0
         class_node = self._source.get_class_name(class_name)
         properties = class_node.get("properties", dict())
@@ -1088,61 +1348,40 @@ class dbapi(abc.ABC):
     @_debug
     def put_device_alias(self, device_name, device_alias):
         device_node = self._source.tango_name_2_node.get(device_name)
+        old_alias = device_node.get("alias")
+        if old_alias is not None:
+            self._source.alias_2_node.pop(old_alias, None)
         device_node["alias"] = device_alias
+        self._source.alias_2_node[device_alias] = device_node
         device_node.save()
 
     @_debug
     def put_device_attribute_property(self, device_name, nb_attributes, attr_prop_list):
-        attr_id = 0
+        it = iter(attr_prop_list)
         prop_attr_device = self._source.get_property_attr_device(device_name)
         for _ in range(nb_attributes):
-            attr_name, prop_nb = (
-                attr_prop_list[attr_id],
-                int(attr_prop_list[attr_id + 1]),
-            )
-            attr_id += 2
-            new_values = {}
-            for prop_id in range(attr_id, attr_id + prop_nb * 2, 2):
-                prop_name, prop_val = (
-                    attr_prop_list[prop_id],
-                    attr_prop_list[prop_id + 1],
-                )
-                new_values[prop_name] = prop_val
-            prop_attr_device[attr_name] = new_values
-            attr_id += prop_nb * 2
+            attr_name, prop_nb = next(it), int(next(it))
+            pairs = itertools.islice(it, prop_nb * 2)
+            prop_attr_device[attr_name] = dict(zip(pairs, pairs))
 
     @_debug
     def put_device_attribute_property2(
         self, device_name, nb_attributes, attr_prop_list
     ):
-        attr_id = 0
+        it = iter(attr_prop_list)
         prop_attr_device = self._source.get_property_attr_device(device_name)
         for _ in range(nb_attributes):
-            attr_name, prop_nb = (
-                attr_prop_list[attr_id],
-                int(attr_prop_list[attr_id + 1]),
-            )
-            attr_id += 2
-            new_values = {}
-            for _prop_id in range(prop_nb):
-                prop_name, prop_nb = (
-                    attr_prop_list[attr_id],
-                    int(attr_prop_list[attr_id + 1]),
-                )
-                attr_id += 2
-                prop_values = []
-                for _prop_sub_id in range(prop_nb):
-                    prop_values.append(attr_prop_list[attr_id])
-                    attr_id += 1
-                if len(prop_values) == 1:
-                    prop_values = prop_values[0]
-                new_values[prop_name] = prop_values
-            prop_attr_device[attr_name] = new_values
+            attr_name, prop_nb = next(it), int(next(it))
+            prop_attr_device[attr_name] = _read_properties2(it, prop_nb)
 
     @_debug
     def put_device_property(self, device_name, nb_properties, attr_prop_list):
+        with self._source.save_batch():
+            self._put_device_property(device_name, nb_properties, attr_prop_list)
+
+    def _put_device_property(self, device_name, nb_properties, attr_prop_list):
         device_name = device_name.lower()
-        device_node = self._source.tango_name_2_node.get(device_name)
+        device_node = self._source.tango_name_2_node.get_lowered(device_name)
         old_properties = device_node.get("properties")
         if isinstance(old_properties, str):  # reference
             properties_key = old_properties.split("/")
@@ -1191,9 +1430,24 @@ class dbapi(abc.ABC):
 
     @_debug
     def unexport_device(self, dev_name):
+        dev_name = dev_name.lower()
+        self._device_info_cache.pop(dev_name, None)
+        self._source.exported_devices.pop(dev_name, None)
         device_info = self._source.get_exported_device_info(dev_name)
+        self._forget_device_host(dev_name, device_info.get("host"))
         device_info.clear()
 
+    def _forget_device_host(self, dev_name, host):
+        if host is None:
+            return
+        host_2_devices = self._source.host_2_devices
+        devices = host_2_devices.get(host)
+        if devices is None:
+            return
+        devices.discard(dev_name)
+        if not devices:
+            del host_2_devices[host]
+
     @_debug
     def unexport_event(self, event_name):
         # Not use in our case
@@ -1225,21 +1479,13 @@ class dbapi(abc.ABC):
     @_debug
     def get_csdb_server_list(self):
         source = self._source
+        get_info = source.get_exported_device_info
         exported_devices = source.get_exported_devices_keys("sys/database*")
-        result = []
-        for dev_name in exported_devices:
-            info = source.get_exported_device_info(dev_name)
-            result.append(info.get("IOR"))
-        return result
+        return [get_info(dev_name).get("IOR") for dev_name in exported_devices]
 
     @_debug
     def get_attribute_alias2(self, attr_name):
-        attr_alias = self._source.get_attr_alias_mapping()
-        result = []
-        for alias, name in attr_alias.items():
-            if name == attr_name:
-                result.append(alias)
-        return result
+        return list(self._source.attr_name_2_aliases.get(attr_name, ()))
 
     @_debug
     def get_alias_attribute(self, alias_name):
@@ -1257,6 +1503,18 @@ class dbapi(abc.ABC):
                 "DataBase::DbRenameServer()",
             )
         device_node = self._source.tango_name_2_node.pop(old_name)
+        self._device_server_cache.clear()
         device_node["tango_name"] = new_name
         self._source.tango_name_2_node[new_name] = device_node
+        old_name_lc, new_name_lc = old_name.lower(), new_name.lower()
+        components = self._source.tango_name_components
+        if components.pop(old_name_lc, None) is not None:
+            components[new_name_lc] = new_name.split("/")
+        devices = self._source.class_2_devices.get(device_node.get("class"))
+        if devices is not None and old_name_lc in devices:
+            devices.discard(old_name_lc)
+            devices.add(new_name_lc)
+        # The export was made under the old name
+        self._device_info_cache.pop(old_name_lc, None)
+        self._forget_export(old_name_lc)
         device_node.save()
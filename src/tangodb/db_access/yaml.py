@@ -1,18 +1,78 @@
 """Yaml backend for tango.databaseds.database.
 """
 
+import contextlib
+import hashlib
 import logging
+import multiprocessing
 import os
+import pickle
+import tempfile
 import weakref
+from concurrent.futures import ProcessPoolExecutor
 
 from . import _abstract
 from ruamel.yaml import YAML
 from collections.abc import MutableSequence, MutableMapping
 
+try:
+    import _ruamel_yaml  # noqa: F401 (C extension of ruamel.yaml.clib)
+except ImportError:
+    _HAS_C_LOADER = False
+else:
+    _HAS_C_LOADER = True
+
 _logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+# Below this number of files, a pool of processes costs more than it saves.
+# Starting the pool takes about 0.4s (forkserver, workers importing the
+# parser) and the pure Python parser reads a server file of 20 devices in
+# about 4.5ms, so even with 4 CPUs the pool only pays off above ~120 files.
+PARALLEL_PARSING_MIN_FILES = 128
+
+# Set to a non empty value to cache the parsed YAML trees in the user cache
+CACHE_ENV_VAR = "TANGODB_YAML_CACHE"
+
+
+def _get_cache_dir():
+    """Directory of the parsed YAML trees, private to the user"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "tangodb")
+
+
+def _create_parser():
+    """Create a safe YAML parser, backed by libyaml when available"""
+    return YAML(typ="safe", pure=not _HAS_C_LOADER)
+
+
+def _parse_yaml_file(path):
+    """Load a single YAML file (run in a worker process)"""
+    parser = _create_parser()
+    with open(path, "rt", encoding="utf-8") as f:
+        return parser.load(f)
+
+
+def _needs_patch(value):
+    """True if the value is a raw mapping or sequence to be wrapped"""
+    if isinstance(value, (Node, NodeList)):
+        return False
+    return isinstance(value, (MutableMapping, MutableSequence))
+
+
+def _do_patch(value, parent):
+    """Wrap a raw mapping or sequence into a Node or NodeList"""
+    if isinstance(value, MutableMapping):
+        return Node(value, parent=parent)
+    return NodeList(value, parent=parent)
+
 
 class NodeList(list):
+
+    # A node is referenced weakly by its children
+    __slots__ = ("__parent", "__weakref__")
+
     def __init__(self, sequence=None, parent=None):
         super(NodeList, self).__init__()
         if sequence:
@@ -23,25 +83,31 @@ class NodeList(list):
             self.__parent = None
 
     def _patch(self, value):
-        if isinstance(value, MutableMapping):
-            if not isinstance(value, Node):
-                value = Node(value, parent=self.parent)
-        elif isinstance(value, MutableSequence):
-            if not isinstance(value, NodeList):
-                value = NodeList(value, parent=self.parent)
+        if _needs_patch(value):
+            value = _do_patch(value, self.parent)
         return value
 
     def __getitem__(self, key):
         value = super(NodeList, self).__getitem__(key)
-        value2 = self._patch(value)
-        if value is not value2:
-            self[key] = value2
-        return value2
+        if _needs_patch(value):
+            value = _do_patch(value, self.parent)
+            self[key] = value
+        return value
 
     def __iter__(self):
         for i in range(0, len(self)):
             yield self[i]
 
+    def _freeze(self):
+        """Wrap the whole content once, instead of on each access"""
+        parent = self.parent
+        for i, value in enumerate(list.__iter__(self)):
+            if _needs_patch(value):
+                value = _do_patch(value, parent)
+                list.__setitem__(self, i, value)
+            if isinstance(value, (Node, NodeList)):
+                value._freeze()
+
     @property
     def parent(self):
         parent = self.__parent
@@ -51,6 +117,9 @@ class NodeList(list):
 
 
 class Node(MutableMapping):
+
+    __slots__ = ("__dict", "__parent", "__source", "__frozen", "__weakref__")
+
     def __init__(self, *args, parent=None, **kwargs):
         self.__dict = {}
         self.__dict.update(*args, **kwargs)
@@ -58,24 +127,46 @@ class Node(MutableMapping):
             self.__parent = weakref.ref(parent)
         else:
             self.__parent = None
+        # Only set on the root nodes, the data source batching the saves
+        self.__source = None
+        # When frozen, every stored mapping or sequence is already wrapped
+        self.__frozen = False
+
+    def _freeze(self):
+        """Wrap the whole content once, instead of on each access"""
+        d = self.__dict
+        for key, value in d.items():
+            if _needs_patch(value):
+                value = _do_patch(value, self)
+                d[key] = value
+            if isinstance(value, (Node, NodeList)):
+                value._freeze()
+        self.__frozen = True
+
+    def _wrap(self, value):
+        """Keep a frozen node fully wrapped on insertion"""
+        if _needs_patch(value):
+            value = _do_patch(value, self)
+            value._freeze()
+        return value
 
     def _patch(self, value):
-        if isinstance(value, MutableMapping):
-            if not isinstance(value, Node):
-                value = Node(value, parent=self)
-        elif isinstance(value, MutableSequence):
-            if not isinstance(value, NodeList):
-                value = NodeList(value, parent=self)
+        if _needs_patch(value):
+            value = _do_patch(value, self)
         return value
 
     def __getitem__(self, key):
-        value = self.__dict.__getitem__(key)
-        value2 = self._patch(value)
-        if value is not value2:
-            self.__dict[key] = value2
-        return value2
+        value = self.__dict[key]
+        if self.__frozen:
+            return value
+        if _needs_patch(value):
+            value = _do_patch(value, self)
+            self.__dict[key] = value
+        return value
 
     def __setitem__(self, key, value):
+        if self.__frozen:
+            value = self._wrap(value)
         self.__dict.__setitem__(key, value)
 
     def __delitem__(self, key):
@@ -86,32 +177,58 @@ class Node(MutableMapping):
 
     def pop(self, key, *args, **kwargs):
         value = self.__dict.pop(key, *args, **kwargs)
-        value2 = self._patch(value)
-        return value2
+        return self._patch(value)
 
     def get(self, key, default=None):
-        value = self.__dict.get(key, default)
-        value2 = self._patch(value)
-        if value is not value2:
-            if key in self.__dict:
-                self.__dict[key] = value2
+        value = self.__dict.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        if self.__frozen:
+            return value
+        if _needs_patch(value):
+            value = _do_patch(value, self)
+            self.__dict[key] = value
         return value
 
-    def setdefault(self, key, *args, **kwargs):
-        return self.__dict.setdefault(key, *args, **kwargs)
+    def setdefault(self, key, default=None):
+        if self.__frozen:
+            default = self._wrap(default)
+        return self.__dict.setdefault(key, default)
 
     def update(self, arg={}, **kwargs):
+        if self.__frozen:
+            arg = {k: self._wrap(v) for k, v in dict(arg).items()}
+            kwargs = {k: self._wrap(v) for k, v in kwargs.items()}
         self.__dict.update(arg)
         if kwargs:
             self.__dict.update(kwargs)
 
     def __iter__(self):
-        for i in self.__dict:
-            yield i
+        return iter(self.__dict)
 
     def __len__(self):
         return len(self.__dict)
 
+    def _patch_all(self):
+        """Wrap every stored mapping or sequence, without freezing"""
+        d = self.__dict
+        for key, value in d.items():
+            if _needs_patch(value):
+                d[key] = _do_patch(value, self)
+
+    def keys(self):
+        return self.__dict.keys()
+
+    def values(self):
+        if not self.__frozen:
+            self._patch_all()
+        return self.__dict.values()
+
+    def items(self):
+        if not self.__frozen:
+            self._patch_all()
+        return self.__dict.items()
+
     @property
     def parent(self):
         parent = self.__parent
@@ -122,42 +239,80 @@ class Node(MutableMapping):
     def __hash__(self):
         return id(self).__hash__()
 
+    def __repr__(self):
+        # Formatted as the wrapped mapping, the property values are read by str
+        return repr(self.__dict)
+
     set = update
 
     def get_all(self):
         return dict(self.__dict)
 
+    def _set_source(self, source):
+        """Attach a root node to its data source"""
+        self.__source = weakref.ref(source)
+
+    def _get_source(self):
+        """Data source of the root node, None if not attached"""
+        node = self
+        parent = node.parent
+        while parent is not None:
+            node, parent = parent, parent.parent
+        source = node.__source
+        if source is None:
+            return None
+        return source()
+
     def save(self):
+        source = self._get_source()
+        pending = None if source is None else source._pending_saves
+        if pending is not None:
+            pending[id(self)] = self
+            return
+        self._write()
+
+    def _write(self):
         pass
 
 
 class FiltrableDict(dict):
     def keys(self, filter_key=None):
-        if filter is None:
+        if filter_key is None or filter_key == "*":
             return super(FiltrableDict, self).keys()
         ks = super(FiltrableDict, self).keys()
-        return _abstract.list_filter(filter_key, ks)
+        return _abstract.iter_filter(filter_key, ks)
 
 
 class YamlDataSource(_abstract.DataSource):
-    def __init__(self, personal_name, db_path):
+
+    def __init__(self, personal_name, db_path, use_cache=None):
         yaml_root = db_path
         if not os.path.exists(yaml_root):
             raise RuntimeError(f"Path '{yaml_root}' do not exists")
         if not os.path.isdir(yaml_root):
             raise RuntimeError(f"Path '{yaml_root}' is not a directory")
         self._yaml_root = yaml_root
+        if use_cache is None:
+            use_cache = bool(os.environ.get(CACHE_ENV_VAR))
+        self._use_cache = use_cache
+        # id -> node waiting to be saved, while a save batch is open
+        self._pending_saves = None
         _abstract.DataSource.__init__(self, personal_name)
 
     def _init_db(self):
         nodes = []
-        for meta in self._iter_data_source():
+        for meta in self._load_data_source():
             if isinstance(meta, MutableSequence):
                 n = NodeList(meta)
-                nodes.append(n)
+                n._freeze()
+                for item in n:
+                    if isinstance(item, Node):
+                        item._set_source(self)
             else:
                 n = Node(meta)
-                nodes.append(n)
+                n._freeze()
+                n._set_source(self)
+            nodes.append(n)
         self._nodes = nodes
         self._devices_info = FiltrableDict()
         self._class_attribute = {}
@@ -168,42 +323,146 @@ class YamlDataSource(_abstract.DataSource):
         return self._nodes
 
     def create_empty(self, parent=None, path=None):
-        return Node(parent=parent)
+        node = Node(parent=parent)
+        if parent is None:
+            node._set_source(self)
+        return node
 
     def create_device(self, device_info, parent=None):
         return Node(device_info, parent=parent)
 
-    def _iter_data_source(self):
-        parser = YAML(pure=True)
-        for root, _dirs, files in os.walk(self._yaml_root, followlinks=True):
-            if "__init__.yml" in files:
-                files.remove("__init__.yml")
-                files.insert(0, "__init__.yml")
-            for file in files:
-                filename, file_extension = os.path.splitext(file)
-                if not (file_extension in [".yml", ".yaml"]):
-                    continue
-                path = os.path.join(root, file)
+    def _iter_yaml_files(self, root=None):
+        """
+        Yields the YAML files of a directory, `__init__.yml` first, then the
+        ones of its sub directories.
+        """
+        if root is None:
+            root = self._yaml_root
+        files = []
+        dirs = []
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                elif entry.name.endswith((".yml", ".yaml")):
+                    if entry.name == "__init__.yml":
+                        files.insert(0, entry.path)
+                    else:
+                        files.append(entry.path)
+        yield from files
+        for path in dirs:
+            yield from self._iter_yaml_files(path)
+
+    def _get_cache_path(self):
+        """Cache file of the YAML tree, keyed by its absolute path"""
+        root = os.path.realpath(self._yaml_root)
+        key = hashlib.sha256(root.encode("utf-8", "surrogateescape")).hexdigest()
+        return os.path.join(_get_cache_dir(), key + ".pkl")
+
+    def _load_data_source(self):
+        """
+        Returns the parsed content of the YAML files.
+
+        When the cache is enabled, the result is stored in the user cache
+        directory, and reused as long as the files are the same and were not
+        modified.
+        """
+        paths = list(self._iter_yaml_files())
+        if not self._use_cache:
+            return list(self._iter_data_source(paths))
+
+        signature = [(path, os.stat(path).st_mtime_ns) for path in paths]
+        cache_path = self._get_cache_path()
+        try:
+            with open(cache_path, "rb") as f:
+                cached_signature, metas = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            _logger.debug("Unreadable YAML cache %s", cache_path, exc_info=True)
+        else:
+            if cached_signature == signature:
+                _logger.debug("Read Yaml content from cache %s", cache_path)
+                return metas
+
+        metas = list(self._iter_data_source(paths))
+        try:
+            cache_dir = os.path.dirname(cache_path)
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump((signature, metas), f, pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError:
+            _logger.debug("Can't write YAML cache %s", cache_path, exc_info=True)
+        return metas
+
+    def _iter_data_source(self, paths=None):
+        if paths is None:
+            paths = list(self._iter_yaml_files())
+        # A single CPU would run the workers one after the other
+        cpu_count = os.cpu_count() or 1
+        if len(paths) < PARALLEL_PARSING_MIN_FILES or cpu_count <= 1:
+            parser = _create_parser()
+            for path in paths:
                 _logger.debug("Read Yaml filename %s", path)
                 with open(path, "rt", encoding="utf-8") as f:
                     meta = parser.load(f)
                     yield meta
+            return
+
+        _logger.debug("Read %d Yaml files in parallel", len(paths))
+        # The server already runs the ORB threads, forking them could deadlock
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("forkserver")
+        else:
+            mp_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(mp_context=mp_context) as pool:
+            # map keeps the order of the files
+            yield from pool.map(_parse_yaml_file, paths, chunksize=8)
+
+    @contextlib.contextmanager
+    def save_batch(self):
+        """
+        Defer the saves of the nodes until the end of the block.
+
+        Each modified node is then written once, whatever the number of
+        `save` calls it received.
+        """
+        if self._pending_saves is not None:
+            # Nested batch, flushed by the outer one
+            yield
+            return
+        pending = self._pending_saves = {}
+        try:
+            yield
+        finally:
+            self._pending_saves = None
+            for node in pending.values():
+                node._write()
 
     def get_node(self, refname):
         node = self.tango_name_2_node[refname]
         if not isinstance(node, Node):
             node = Node(node)
+            node._set_source(self)
             self.tango_name_2_node[refname] = node
         return node
 
     def create_class_filename(self, class_name):
         _logger.error("create_class_filename '%s' is not implemented", class_name)
         node = Node()
+        node._set_source(self)
         return node
 
     def create_server_filename(self, server_name):
         _logger.error("create_server_filename '%s' is not implemented", server_name)
         node = Node()
+        node._set_source(self)
         return node
 
     def get_attr_alias_mapping(self):
@@ -255,12 +514,16 @@ class yaml(_abstract.dbapi):
 
     DB_API_NAME = "yaml"
 
+    def __init__(self, personal_name="2", db_path="tango", use_cache=None, **keys):
+        self._use_cache = use_cache
+        _abstract.dbapi.__init__(self, personal_name, db_path, **keys)
+
     def _create_data_source(self, personal_name, db_path):
-        return YamlDataSource(personal_name, db_path)
+        return YamlDataSource(personal_name, db_path, use_cache=self._use_cache)
 
 
-def get_db(personal_name="2", db_path="tango", **keys):
-    return yaml(personal_name=personal_name, db_path=db_path)
+def get_db(personal_name="2", db_path="tango", use_cache=None, **keys):
+    return yaml(personal_name=personal_name, db_path=db_path, use_cache=use_cache)
 
 
 def get_wildcard_replacement():
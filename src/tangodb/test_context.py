@@ -5,7 +5,6 @@ from argparse import Namespace
 from functools import partial
 
 import multiprocessing
-import queue
 
 from tango import DeviceProxy
 from tango.test_context import get_server_host_port
@@ -42,7 +41,9 @@ class DataBaseContext:
         # Patch bug #819
         os.environ["ORBscanGranularity"] = "0"
 
-        self.queue = multiprocessing.Queue()
+        # The server process reports once, through a one way pipe
+        self._parent_conn, self._child_conn = multiprocessing.Pipe(duplex=False)
+        self._reported = False
         self.thread = multiprocessing.Process(target=self.target, args=(runserver,))
         # self.thread.daemon = False
 
@@ -54,17 +55,24 @@ class DataBaseContext:
             etype, value, tb = sys.exc_info()
             if process:
                 tb = None  # Traceback objects can't be pickled
-            self.queue.put((etype, value, tb))
+            self._report(etype, value, tb)
         finally:
-            # Put something in the queue just in case
+            # Report something just in case
             exc = RuntimeError("The server failed to report anything")
-            self.queue.put((None, exc, None))
+            self._report(None, exc, None)
             # Make sure the process has enough time to send the items
             # because the it might segfault while cleaning up the
             # the tango resources
             if process:
                 time.sleep(0.1)
 
+    def _report(self, *args):
+        """Send the first report to the parent process, drop the others"""
+        if self._reported:
+            return
+        self._child_conn.send(args)
+        self._reported = True
+
     def get_server_access(self):
         """Return the full server name."""
         form = "tango://{0}:{1}/{2}"
@@ -77,24 +85,30 @@ class DataBaseContext:
     def post_init(self):
         try:
             host, port = get_server_host_port()
-            self.queue.put((host, port))
+            self._report(host, port)
         except Exception as exc:
-            self.queue.put((None, exc, None))
+            self._report(None, exc, None)
         finally:
-            # Put something in the queue just in case
+            # Report something just in case
             exc = RuntimeError("The post_init routine failed to report anything")
-            self.queue.put((None, exc, None))
+            self._report(None, exc, None)
 
     def start(self):
         """Run the server."""
         self.thread.start()
+        # Only the server process writes, so that a crash is seen as EOF
+        self._child_conn.close()
         self.connect()
         return self
 
     def connect(self):
+        args = None
         try:
-            args = self.queue.get(timeout=self.timeout)
-        except queue.Empty:
+            if self._parent_conn.poll(self.timeout):
+                args = self._parent_conn.recv()
+        except EOFError:
+            pass
+        if args is None:
             if self.thread.is_alive():
                 raise RuntimeError(
                     "The server appears to be stuck at initialization. "
@@ -5,12 +5,12 @@
 # Imports
 import os
 import sys
-import time
+import pickle
 import struct
 import socket
-import traceback
 import collections
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
 # Concurrency imports
 import threading
@@ -38,22 +38,36 @@ IOR = collections.namedtuple(
 )
 
 
-def ascii_to_bytes(s):
-    convert = lambda x: bytes((int(x, 16),))
-    return b"".join(convert(s[i : i + 2]) for i in range(0, len(s), 2))
+_IOR_HEADER = struct.Struct("II")
 
 
+@lru_cache(maxsize=64)
+def _ior_head_struct(dtype_length):
+    return struct.Struct("II{:d}sIIIBBHI".format(dtype_length))
+
+
+@lru_cache(maxsize=64)
+def _ior_struct(dtype_length, host_length):
+    return struct.Struct("II{:d}sIIIBBHI{:d}sH0I".format(dtype_length, host_length))
+
+
+@lru_cache(maxsize=32)
 def parse_ior(encoded_ior):
     assert encoded_ior[:4] == "IOR:"
-    ior = ascii_to_bytes(encoded_ior[4:])
-    dtype_length = struct.unpack_from("II", ior)[-1]
-    form = "II{:d}sIIIBBHI".format(dtype_length)
-    host_length = struct.unpack_from(form, ior)[-1]
-    form = "II{:d}sIIIBBHI{:d}sH0I".format(dtype_length, host_length)
-    values = struct.unpack_from(form, ior)
-    values += (ior[struct.calcsize(form) :],)
-    strip = lambda x: x[:-1] if isinstance(x, bytes) else x
-    return IOR(*map(strip, values))
+    ior = bytes.fromhex(encoded_ior[4:])
+    dtype_length = _IOR_HEADER.unpack_from(ior)[-1]
+    host_length = _ior_head_struct(dtype_length).unpack_from(ior)[-1]
+    form = _ior_struct(dtype_length, host_length)
+    values = form.unpack_from(ior)
+    # Strip the trailing byte of the dtype, host and body strings
+    return IOR(
+        *values[:2],
+        values[2][:-1],
+        *values[3:10],
+        values[10][:-1],
+        values[11],
+        ior[form.size : -1],
+    )
 
 
 def get_server_host_port():
@@ -68,35 +82,81 @@ def literal_dict(arg):
     return dict(literal_eval(arg))
 
 
+@lru_cache(maxsize=128)
 def device(path):
     """Get the device class from a given module."""
     module_name, device_name = path.rsplit(".", 1)
     try:
         module = import_module(module_name)
-    except Exception:
-        raise ArgumentTypeError(
-            "Error importing {0}.{1}:\n{2}".format(
-                module_name, device_name, traceback.format_exc()
-            )
-        )
+    except Exception as exc:
+        raise ArgumentTypeError(f"Error importing {module_name}.{device_name}") from exc
     return getattr(module, device_name)
 
 
+@lru_cache(maxsize=1)
 def get_host_ip():
     """Get the primary external host IP.
 
     This is useful because an explicit IP is required to get
     tango events to work properly. Note that localhost does not work
     either.
+
+    The address of the host name is tried first, falling back on the
+    route to a public address. Resolving the host name can itself stall
+    on a misconfigured DNS. The result is cached for the process.
     """
-    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    # Connecting to a UDP address doesn't send packets
-    s.connect(("8.8.8.8", 0))
-    # Get ip address
-    ip = s.getsockname()[0]
+    try:
+        ip = socket.gethostbyname(socket.gethostname())
+    except OSError:
+        pass
+    else:
+        if not ip.startswith("127."):
+            return ip
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        # Connecting to a UDP address doesn't send packets
+        s.connect(("8.8.8.8", 0))
+        # Get ip address
+        ip = s.getsockname()[0]
     return ip
 
 
+# Default multiprocessing context used to run the servers in a process
+_MP_CTX = multiprocessing.get_context()
+
+# Modules imported once by the fork server, instead of by each server process.
+# The fork server is shared by the whole process, so the list is only applied
+# when a server process is first started with it.
+_forkserver_preload_applied = False
+_FORKSERVER_PRELOAD = [
+    "tango",
+    "tango.server",
+    "tango.utils",
+    "tangodb.test_context_device",
+]
+
+
+def add_forkserver_preload(module_names):
+    """Also preload the given modules in the fork server.
+
+    Useful for the modules of the devices run in process mode with the
+    `forkserver` start method. It has to be called before the first server
+    process is started.
+    """
+    for module_name in module_names:
+        if module_name not in _FORKSERVER_PRELOAD:
+            _FORKSERVER_PRELOAD.append(module_name)
+
+
+def _apply_forkserver_preload():
+    global _forkserver_preload_applied
+    if _forkserver_preload_applied:
+        return
+    _forkserver_preload_applied = True
+    multiprocessing.get_context("forkserver").set_forkserver_preload(
+        _FORKSERVER_PRELOAD
+    )
+
+
 def _device_class_from_field(field):
     """
     Helper function that extracts and return a device class from a
@@ -106,13 +166,12 @@ def _device_class_from_field(field):
 
     :return: the device class extracted from the field
     """
-    device_cls_class = None
     if is_non_str_seq(field):
-        (device_cls_class, device_class) = (field[0], field[1])
-        if isinstance(device_cls_class, str):
-            device_cls_class = device(device_cls_class)
+        device_cls_class, device_class = field[0], field[1]
     else:
-        device_class = field
+        device_cls_class, device_class = None, field
+    if isinstance(device_cls_class, str):
+        device_cls_class = device(device_cls_class)
     if isinstance(device_class, str):
         device_class = device(device_class)
     return (device_cls_class, device_class)
@@ -248,10 +307,17 @@ class MultiDeviceTestContext(object):
       or if that isn't specified the global green mode.
     :type green_mode:
       :obj:`~tango.GreenMode`
+    :param mp_context:
+      Multiprocessing context used to start the server in process mode.
+      With `forkserver` or `spawn`, the server doesn't inherit a copy of
+      the test process, but the device classes must then be picklable,
+      i.e. defined at the top level of a module.
+      Optional.  Default is the platform default start method.
+    :type mp_context:
+      :obj:`multiprocessing.context.BaseContext`
     """
 
     dbase = "dbase=yes"
-    command = "{0} {1} -ORBendPoint giop:tcp:{2}:{3}"
 
     thread_timeout = 3.0
     process_timeout = 5.0
@@ -269,6 +335,7 @@ class MultiDeviceTestContext(object):
         daemon=False,
         timeout=None,
         green_mode=None,
+        mp_context=None,
     ):
         if not server_name:
             _, first_device = _device_class_from_field(devices_info[0]["class"])
@@ -294,13 +361,41 @@ class MultiDeviceTestContext(object):
         self.port = port
         self.timeout = timeout
         self.server_name = "/".join(("dserver", server_name, instance_name))
-        self.queue = multiprocessing.Queue() if process else queue.Queue()
+        # The server reports its start by setting an event. In process mode
+        # the address is handed over through shared memory, and the queue
+        # only carries the errors. In thread mode the reports are queued as is.
+        self._process = process
+        self._start_method = None
+        if process:
+            if mp_context is None:
+                mp_context = _MP_CTX
+            self._start_method = mp_context.get_start_method()
+            self.queue = mp_context.Queue()
+            self._ready = mp_context.Event()
+            self._host = mp_context.RawArray("c", 256)
+            self._port = mp_context.RawValue("i", 0)
+        else:
+            self._ready = threading.Event()
+            # deque appends and pops are atomic, no lock is needed
+            self._result = collections.deque()
         self._devices = {}
+        self._devices_lock = threading.Lock()
+        self._prewarm_thread = None
+        self._device_names = [
+            info["name"]
+            for device_info in devices_info
+            for info in device_info["devices"]
+        ]
 
         # Command args
-        string = self.command.format(server_name, instance_name, host, port)
-        string += " -v{0}".format(debug) if debug else ""
-        cmd_args = string.split()
+        cmd_args = [
+            server_name,
+            instance_name,
+            "-ORBendPoint",
+            f"giop:tcp:{host}:{port}",
+        ]
+        if debug:
+            cmd_args.append(f"-v{debug}")
 
         class_list = []
         device_list = []
@@ -330,48 +425,93 @@ class MultiDeviceTestContext(object):
             raise ValueError(
                 "mixing HLAPI and classical API in devices_info " "is not supported"
             )
-        if class_list:
-            runserver = partial(run, class_list, cmd_args, green_mode=green_mode)
-        elif len(device_list) == 1 and hasattr(device_list[0], "run_server"):
-            runserver = partial(device.run_server, cmd_args, green_mode=green_mode)
-        elif device_list:
-            runserver = partial(run, device_list, cmd_args, green_mode=green_mode)
-        else:
+        if not class_list and not device_list:
             raise ValueError("Wrong format of devices_info")
+        # The server function is built by the target, in the server process
+        self._class_list = class_list
+        self._device_list = device_list
+        self._cmd_args = cmd_args
+        self._green_mode = green_mode
 
-        cls = multiprocessing.Process if process else threading.Thread
-        self.thread = cls(target=self.target, args=(runserver, process))
+        if process:
+            # A forkserver or spawned process doesn't inherit the current
+            # environment (TANGO_HOST, ORBscanGranularity...)
+            args = (process, dict(os.environ))
+            self.thread = mp_context.Process(target=self.target, args=args)
+        else:
+            self.thread = threading.Thread(target=self.target)
         self.thread.daemon = daemon
 
-    def target(self, runserver, process=False):
+    def _get_runserver(self):
+        """Return the function running the server"""
+        cmd_args, green_mode = self._cmd_args, self._green_mode
+        if self._class_list:
+            return partial(run, self._class_list, cmd_args, green_mode=green_mode)
+        device_list = self._device_list
+        if len(device_list) == 1 and hasattr(device_list[0], "run_server"):
+            return partial(device_list[0].run_server, cmd_args, green_mode=green_mode)
+        return partial(run, device_list, cmd_args, green_mode=green_mode)
+
+    def target(self, process=False, environ=None):
+        if environ is not None:
+            os.environ.update(environ)
         try:
+            runserver = self._get_runserver()
             runserver(post_init_callback=self.post_init, raises=True)
         except Exception:
             # Put exception in the queue
             etype, value, tb = sys.exc_info()
             if process:
                 tb = None  # Traceback objects can't be pickled
-            self.queue.put((etype, value, tb))
+            self._report_error(etype, value, tb)
+        else:
+            if not self._ready.is_set():
+                exc = RuntimeError("The server failed to report anything")
+                self._report_error(None, exc, None)
         finally:
-            # Put something in the queue just in case
-            exc = RuntimeError("The server failed to report anything")
-            self.queue.put((None, exc, None))
-            # Make sure the process has enough time to send the items
+            self._ready.set()
+            # Make sure the process sent the items before going on,
             # because the it might segfault while cleaning up the
             # the tango resources
             if process:
-                time.sleep(0.1)
+                self.queue.close()
+                self.queue.join_thread()
 
     def post_init(self):
         try:
             host, port = get_server_host_port()
-            self.queue.put((host, port))
+            self._report_address(host, port)
         except Exception as exc:
-            self.queue.put((None, exc, None))
+            self._report_error(None, exc, None)
         finally:
-            # Put something in the queue just in case
-            exc = RuntimeError("The post_init routine failed to report anything")
-            self.queue.put((None, exc, None))
+            self._ready.set()
+
+    def _report_address(self, host, port):
+        if self._process:
+            self._host.value = host.encode()
+            self._port.value = port
+        else:
+            self._result.append((host, port))
+
+    def _report_error(self, etype, value, tb):
+        if self._process:
+            self.queue.put((etype, value, tb))
+        else:
+            self._result.append((etype, value, tb))
+
+    def _get_report(self):
+        """Return the first report of the server, or None"""
+        if not self._process:
+            try:
+                return self._result.popleft()
+            except IndexError:
+                return None
+        if self._host.value:
+            return self._host.value.decode(), self._port.value
+        try:
+            return self.queue.get(timeout=self.timeout)
+        except queue.Empty:
+            return None
 
     # def append_db_file(self, server, instance, tangoclass, device_prop_info):
     #     """Generate a database file corresponding to the given arguments."""
@@ -427,37 +567,65 @@ class MultiDeviceTestContext(object):
         Maintains previously accessed device proxies in a cache to not recreate
         then on every access.
         """
-        if device_name not in self._devices:
+        with self._devices_lock:
+            device = self._devices.get(device_name)
+        if device is None:
+            # Connect without holding the lock
             device = DeviceProxy(self.get_device_access(device_name))
-            self._devices[device_name] = device
-        return self._devices[device_name]
+            with self._devices_lock:
+                device = self._devices.setdefault(device_name, device)
+        return device
+
+    def _prewarm(self):
+        """Create the proxies of the exported devices in advance"""
+        device_names = self._device_names
+        if not device_names:
+            return
+        # The proxies connect in parallel, DeviceProxy releases the GIL
+        with ThreadPoolExecutor(max_workers=min(8, len(device_names))) as pool:
+            futures = {
+                pool.submit(DeviceProxy, self.get_device_access(name)): name
+                for name in device_names
+            }
+        for future, device_name in futures.items():
+            if future.exception() is not None:
+                # get_device will report it on the first access
+                continue
+            with self._devices_lock:
+                self._devices.setdefault(device_name, future.result())
 
     def start(self):
         """Run the server."""
-        self.thread.start()
+        if self._start_method == "forkserver":
+            _apply_forkserver_preload()
+        try:
+            self.thread.start()
+        except (AttributeError, TypeError, pickle.PicklingError) as exc:
+            if self._start_method in (None, "fork"):
+                raise
+            raise RuntimeError(
+                "The devices can't be sent to a server process started with "
+                "'{}': the device classes must be picklable, i.e. defined at "
+                "the top level of a module".format(self._start_method)
+            ) from exc
         self.connect()
+        self._prewarm_thread = threading.Thread(target=self._prewarm, daemon=True)
+        self._prewarm_thread.start()
         return self
 
+    def __getstate__(self):
+        # Pickled to start the server process, which doesn't need the lock
+        state = self.__dict__.copy()
+        del state["_devices_lock"]
+        del state["_prewarm_thread"]
+        return state
+
     def connect(self):
-        try:
-            args = self.queue.get(timeout=self.timeout)
-        except queue.Empty:
-            if self.thread.is_alive():
-                raise RuntimeError(
-                    "The server appears to be stuck at initialization. "
-                    "Check stdout/stderr for more information."
-                )
-            elif hasattr(self.thread, "exitcode"):
-                raise RuntimeError(
-                    "The server process stopped with exitcode {}. "
-                    "Check stdout/stderr for more information."
-                    "".format(self.thread.exitcode)
-                )
-            else:
-                raise RuntimeError(
-                    "The server stopped without reporting. "
-                    "Check stdout/stderr for more information."
-                )
+        if not self._ready.wait(self.timeout):
+            raise self._not_reported_error()
+        args = self._get_report()
+        if args is None:
+            raise self._not_reported_error()
         try:
             self.host, self.port = args
         except ValueError as e:
@@ -465,9 +633,35 @@ class MultiDeviceTestContext(object):
         # Get server proxy
         self.server = DeviceProxy(self.get_server_access())
         self.server.ping()
+        # Also served by get_device
+        with self._devices_lock:
+            self._devices[self.server_name] = self.server
+
+    def _not_reported_error(self):
+        """Describe why the server did not report its start"""
+        if self.thread.is_alive():
+            return RuntimeError(
+                "The server appears to be stuck at initialization. "
+                "Check stdout/stderr for more information."
+            )
+        elif hasattr(self.thread, "exitcode"):
+            return RuntimeError(
+                "The server process stopped with exitcode {}. "
+                "Check stdout/stderr for more information."
+                "".format(self.thread.exitcode)
+            )
+        else:
+            return RuntimeError(
+                "The server stopped without reporting. "
+                "Check stdout/stderr for more information."
+            )
 
     def stop(self):
         """Kill the server."""
+        # Don't leave proxies connecting to a killed server
+        if self._prewarm_thread is not None:
+            self._prewarm_thread.join(self.timeout)
+            self._prewarm_thread = None
         # try:
         if self.server:
             self.server.command_inout("Kill")
@@ -0,0 +1,261 @@
+import pytest
+
+from tangodb.db_access import _abstract
+from tangodb.db_access import yaml as yaml_db
+
+
+def write_server(path, personal_name, devices, server="Srv"):
+    lines = [f"server: {server}", f"personal_name: '{personal_name}'", "device:"]
+    for tango_name, klass in devices:
+        lines.append(f"- class: {klass}")
+        lines.append(f"  tango_name: {tango_name}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture
+def db(tmp_path):
+    write_server(
+        tmp_path / "srv.yml",
+        "p1",
+        [("dom/fam/mem1", "Motor"), ("dom/fam2/Mem2", "Counter")],
+    )
+    return yaml_db.get_db(db_path=str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (None, ["abc", "Abd", "xbc"]),
+        ("*", ["abc", "Abd", "xbc"]),
+        ("*.*", ["abc", "Abd", "xbc"]),
+        ("ABC", ["abc"]),
+        ("ab", []),
+        ("a*", ["abc", "Abd"]),
+        ("*C", ["abc", "xbc"]),
+        ("*B*", ["abc", "Abd", "xbc"]),
+        ("a*c", ["abc"]),
+        ("a.c", ["abc"]),
+        ("[ax]bc", ["abc", "xbc"]),
+    ],
+)
+def test_list_filter(pattern, expected):
+    names = ["abc", "Abd", None, "xbc"]
+    assert _abstract.list_filter(pattern, names) == expected
+    assert list(_abstract.iter_filter(pattern, names)) == expected
+
+
+@pytest.mark.parametrize("pattern", [None, "*", "*.*"])
+def test_items_filter_match_all(pattern):
+    items = [("abc", 1), ("Abd", 2)]
+    assert _abstract.items_filter(pattern, items) == items
+
+
+def test_items_filter():
+    items = [("abc", 1), ("Abd", 2), ("xbc", 3)]
+    assert _abstract.items_filter("A*", items) == [("abc", 1), ("Abd", 2)]
+
+
+def test_wildcard_fullmatch():
+    assert _abstract._compile_wildcard("dom/fam/*").fullmatch("DOM/Fam/mem")
+    assert not _abstract._compile_wildcard("dom/fam").fullmatch("dom/fam/mem")
+    assert not _abstract._compile_wildcard("*fam").fullmatch("dom/fam/mem")
+
+
+def test_exported_devices(db):
+    assert db.get_device_exported_list("dom/*") == []
+    db.export_device("DOM/fam/mem1", "IOR:00", "host1", "12", "5")
+    assert db.get_device_exported_list("dom/*") == ["dom/fam/mem1"]
+    assert db.get_exported_device_list_for_class("mot*") == ["dom/fam/mem1"]
+    assert db.get_exported_device_list_for_class("Mot") == []
+    assert db.get_host_list("host*") == ["host1"]
+    assert db.get_host_server_list("host1") == ["Srv/p1"]
+    db.unexport_device("Dom/Fam/Mem1")
+    assert db.get_device_exported_list("dom/*") == []
+    assert db.get_host_server_list("host1") == []
+    assert db.get_exported_device_list_for_class("Motor") == []
+    assert db.get_host_list("host*") == []
+
+
+def test_exported_database_device_from_yaml(tmp_path):
+    write_server(
+        tmp_path / "db.yml", "1", [("sys/database/1", "DataBase")], server="DataBaseds"
+    )
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert db.get_exported_device_list_for_class("DataBase") == []
+    db.export_device("sys/database/1", "IOR:00", "host1", "12", "5")
+    assert db.get_exported_device_list_for_class("DataBase") == ["sys/database/1"]
+
+
+def test_device_list_matches_the_whole_class(db):
+    assert db.get_device_list("Srv/p1", "Motor") == ["dom/fam/mem1"]
+    assert db.get_device_list("*", "mot*") == ["dom/fam/mem1"]
+    assert db.get_device_list("*", "Mot") == []
+
+
+def test_add_and_delete_device(db):
+    db.add_device("NewSrv/p2", ("new/fam3/mem3", "0"), "Other", alias="myalias")
+    assert "new" in db.get_device_domain_list("*")
+    assert "fam3" in db.get_device_family_list("new/*")
+    assert "Other" in db.get_class_list("*")
+    assert db.get_server_name_list("new*") == ["newsrv"]
+    assert db.get_device_alias_list("my*") == ["myalias"]
+    db.export_device("new/fam3/mem3", "IOR:00", "host1", "12", "5")
+    assert db.get_exported_device_list_for_class("Other") == ["new/fam3/mem3"]
+    assert db.get_host_server_list("host1") == ["NewSrv/p2"]
+
+    db.delete_device("new/fam3/mem3")
+    assert "new" not in db.get_device_domain_list("*")
+    assert "Other" not in db.get_class_list("*")
+    assert db.get_device_alias_list("my*") == []
+    assert db.get_device_exported_list("new/*") == []
+    assert db.get_exported_device_list_for_class("Other") == []
+    assert db.get_host_list("*") == []
+
+
+def test_rename_server(db):
+    db.export_device("dom/fam2/mem2", "IOR:00", "host2", "12", "5")
+    db.rename_server("dom/fam2/Mem2", "dom/fam2/mem3")
+    db.export_device("dom/fam2/mem3", "IOR:00", "host1", "12", "5")
+    assert db.get_exported_device_list_for_class("Counter") == ["dom/fam2/mem3"]
+    assert sorted(db.get_device_member_list("dom/fam2/*")) == ["mem3"]
+    assert db.get_host_list("*") == ["host1"]
+
+
+def test_parallel_parsing(tmp_path, monkeypatch):
+    for i in range(4):
+        write_server(tmp_path / f"srv{i}.yml", f"p{i}", [(f"dom/fam/m{i}", "Cls")])
+    monkeypatch.setattr(yaml_db, "PARALLEL_PARSING_MIN_FILES", 2)
+    monkeypatch.setattr(yaml_db.os, "cpu_count", lambda: 4)
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert sorted(db.get_device_member_list("dom/fam/*")) == ["m0", "m1", "m2", "m3"]
+
+
+def test_sequential_parsing_on_a_single_cpu(tmp_path, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("no pool of processes on a single CPU")
+
+    for i in range(4):
+        write_server(tmp_path / f"srv{i}.yml", f"p{i}", [(f"dom/fam/m{i}", "Cls")])
+    monkeypatch.setattr(yaml_db, "PARALLEL_PARSING_MIN_FILES", 2)
+    monkeypatch.setattr(yaml_db.os, "cpu_count", lambda: 1)
+    monkeypatch.setattr(yaml_db, "ProcessPoolExecutor", no_pool)
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert sorted(db.get_device_member_list("dom/fam/*")) == ["m0", "m1", "m2", "m3"]
+
+
+def test_device_member_list_is_lower_case(tmp_path):
+    write_server(
+        tmp_path / "srv.yml",
+        "p1",
+        [("dom/fam/Mem1", "Cls"), ("dom/fam2/MEM1", "Cls"), ("dom/fam/mem2", "Cls")],
+    )
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert sorted(db.get_device_member_list("dom/*")) == ["mem1", "mem2"]
+
+
+def test_filtrable_dict_keys():
+    d = yaml_db.FiltrableDict({"dom/fam/mem1": 1, "dom/fam/mem2": 2, "other/a/b": 3})
+    assert sorted(d.keys()) == ["dom/fam/mem1", "dom/fam/mem2", "other/a/b"]
+    assert sorted(d.keys("*")) == ["dom/fam/mem1", "dom/fam/mem2", "other/a/b"]
+    assert sorted(d.keys("DOM/*")) == ["dom/fam/mem1", "dom/fam/mem2"]
+
+
+def test_case_insensitive_dict_setdefault():
+    d = _abstract.CaseInsensitiveDict()
+    assert d.setdefault("ABC", 1) == 1
+    assert d.setdefault("aBc", 2) == 1
+    assert d["abc"] == 1
+    assert list(d.keys()) == ["abc"]
+
+
+def test_save_batch_is_per_source(db, tmp_path, monkeypatch):
+    written = []
+    monkeypatch.setattr(yaml_db.Node, "_write", lambda self: written.append(self))
+    other_path = tmp_path / "other"
+    other_path.mkdir()
+    write_server(other_path / "srv.yml", "p1", [("dom/fam/mem9", "Motor")])
+    other = yaml_db.get_db(db_path=str(other_path))
+
+    node = db._source.get_node("dom/fam/mem1")
+    other_node = other._source.get_node("dom/fam/mem9")
+    with db.save_batch():
+        node.save()
+        node.save()
+        other_node.save()
+        assert written == [other_node]
+    assert written == [other_node, node]
+    node.save()
+    assert written == [other_node, node, node]
+
+
+def test_nested_mapping_device_property(tmp_path):
+    (tmp_path / "srv.yml").write_text(
+        "server: Srv\n"
+        "personal_name: 'p1'\n"
+        "device:\n"
+        "- class: Motor\n"
+        "  tango_name: dom/fam/mem1\n"
+        "  properties:\n"
+        "    config: {a: 1, b: {c: [1, 2]}}\n"
+        "    steps: 10\n"
+    )
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert db.get_device_property("dom/fam/mem1", ["config", "steps"]) == [
+        "dom/fam/mem1",
+        "2",
+        "config",
+        "1",
+        "{'a': 1, 'b': {'c': [1, 2]}}",
+        "steps",
+        "1",
+        "10",
+    ]
+
+
+def test_delete_server_then_device(tmp_path):
+    write_server(tmp_path / "srv1.yml", "p1", [("dom/fam/mem1", "Motor")])
+    write_server(tmp_path / "srv2.yml", "p2", [("dom/fam/mem2", "Motor")])
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    db.export_device("dom/fam/mem1", "IOR:00", "host1", "12", "5")
+    db.export_device("dom/fam/mem2", "IOR:00", "host2", "12", "5")
+    db.delete_server("Srv/p1")
+    assert db.get_host_list("*") == ["host2"]
+    assert "Motor" in db.get_class_list("*")
+    assert db.get_device_exported_list("*") == ["dom/fam/mem2"]
+    assert db.get_device_member_list("dom/fam/*") == ["mem2"]
+    db.delete_device("dom/fam/mem1")
+    assert "Motor" in db.get_class_list("*")
+    assert db.get_device_list("*", "Motor") == ["dom/fam/mem2"]
+
+
+def test_exported_devices_order(tmp_path):
+    names = [f"dom/fam/mem{i}" for i in range(20)]
+    write_server(tmp_path / "srv.yml", "p1", [(name, "Motor") for name in names])
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    exported = names[::-1]
+    for name in exported:
+        db.export_device(name, "IOR:00", "host1", "12", "5")
+    assert db.get_device_exported_list("*") == exported
+    assert db.get_exported_device_list_for_class("Mot*") == exported
+    assert db.get_exported_device_list_for_class("*") == exported
+
+
+def test_dserver_member_list(db):
+    assert sorted(db.get_device_member_list("dserver/*")) == ["2", "p1"]
+    db.add_device("NewSrv/P2", ("new/fam3/mem3", "0"), "Other")
+    assert sorted(db.get_device_member_list("dserver/newsrv/*")) == ["p2"]
+
+
+def test_non_string_alias(tmp_path):
+    (tmp_path / "srv.yml").write_text(
+        "server: Srv\n"
+        "personal_name: 'p1'\n"
+        "device:\n"
+        "- class: Motor\n"
+        "  tango_name: dom/fam/mem1\n"
+        "  alias: 123\n"
+    )
+    db = yaml_db.get_db(db_path=str(tmp_path))
+    assert db.get_device_list("*", "Motor") == ["dom/fam/mem1"]
+    d = _abstract.CaseInsensitiveDict({123: "a", "ABC": "b"})
+    assert d[123] == "a" and d["abc"] == "b"
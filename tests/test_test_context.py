@@ -1,12 +1,12 @@
 import os
 import pytest
 
-from tango import DevState
+from tango import DevFailed, DevState
 from tango.server import Device
 from tango.server import attribute, device_property
 
 from tangodb.test_context import DataBaseContext
-from tangodb.test_context_device import MultiDeviceTestContext
+from tangodb.test_context_device import MultiDeviceTestContext, parse_ior
 
 
 class Device1(Device):
@@ -38,6 +38,35 @@ class Device2(Device):
         return self._attr1
 
 
+class BrokenDevice(Device):
+    def init_device(self):
+        super(Device, self).init_device()
+        raise RuntimeError("broken on purpose")
+
+
+IOR_STRING = (
+    "IOR:010000001700000049444c3a54616e676f2f4465766963655f363a312e300000"
+    "010000000000000094000000010102000a0000003139322e302e322e3200102708"
+    "00000064617461626173650300000000000000080000000100000000545441010000"
+    "001c0000000100000001000100010000000100010509010100010000000901010002"
+    "545441340000000100000003000000766d0000240000002f746d702f6f6d6e692d72"
+    "6f6f742f3030303032313030342d3137393230353235393100"
+)
+
+
+def test_parse_ior():
+    ior = parse_ior(IOR_STRING)
+    assert ior.dtype == b"IDL:Tango/Device_6:1.0"
+    assert ior.dtype_length == len(ior.dtype) + 1
+    assert ior.nb_profile == 1
+    assert (ior.major, ior.minor) == (1, 1)
+    assert ior.host == b"192.0.2.2"
+    assert ior.host_length == len(ior.host) + 1
+    assert ior.port == 10000
+    assert ior.body.startswith(b"\x08\x00\x00\x00database")
+    assert ior.body.endswith(b"/tmp/omni-root/000021004-1792052591")
+
+
 @pytest.fixture(scope="module")
 def database():
     with DataBaseContext(db_access="yaml", db_path="tests/tango_database") as context:
@@ -77,3 +106,29 @@ def test_multi_with_two_devices(server):
     assert proxy1.attr1 == 100
     assert proxy1.prop1 == "Hello, world!"
     assert proxy2.attr1 == 200
+
+
+def test_prewarmed_devices(server):
+    server._prewarm_thread.join(server.timeout)
+    assert set(server._devices) == {
+        "dserver/test/test1",
+        "test/device1/1",
+        "test/device2/1",
+    }
+
+
+def test_device_failing_at_init(database):
+    devices_info = (
+        {"class": BrokenDevice, "devices": [{"name": "test/broken/1"}]},
+        {"class": Device2, "devices": []},
+    )
+    context = MultiDeviceTestContext(
+        devices_info, server_name="test", instance_name="broken", process=True
+    )
+    # The error is reported through the queue, without waiting for the timeout
+    with pytest.raises(RuntimeError) as info:
+        context.start()
+    assert info.value.args[0] is DevFailed
+    assert "broken on purpose" in info.value.args[1].args[0].desc
+    context.join(context.timeout)
+    assert not context.thread.is_alive()